@@ -0,0 +1,74 @@
+"""
+One-time migration: convert the weekly snapshot CSVs to Parquet (zstd) so the
+Streamlit app can read them with columnar pruning and native datetimes.
+Re-run after the collectors refresh the CSVs; the app falls back to the CSVs
+when no Parquet sibling exists.
+"""
+
+import shutil
+from pathlib import Path
+import pandas as pd
+
+DATA_CANDIDATES = [
+    Path("../snapshot_data"),
+    Path("../data"),
+    Path("data"),
+]
+FILES = [
+    ("brand_weekly_for_streamlit.csv", ["week_start", "week_end"]),
+    ("youtube_brand_channel_weekly_snapshot_ALL.csv", ["week_start", "week_end"]),
+]
+
+def migrate(fname: str, date_cols: list) -> None:
+    for base in DATA_CANDIDATES:
+        src = base / fname
+        if not src.exists():
+            continue
+        df = pd.read_csv(src, encoding='utf-8')
+        for c in date_cols:
+            if c in df.columns:
+                df[c] = pd.to_datetime(df[c])
+        dst = src.with_suffix('.parquet')
+        df.to_parquet(dst, compression='zstd', index=False)
+        print(f"{src} -> {dst} ({len(df)} rows)")
+
+def write_brand_totals() -> None:
+    """Persist per-brand metric totals so the app can rank brands without scanning the frame."""
+    for base in DATA_CANDIDATES:
+        src = base / "brand_weekly_for_streamlit.csv"
+        if not src.exists():
+            continue
+        df = pd.read_csv(src, encoding='utf-8')
+        metric_cols = [c for c in df.columns if c.startswith('weekly_')]
+        totals = df.groupby('keyword')[metric_cols].sum()
+        dst = base / "brand_totals_all.parquet"
+        totals.to_parquet(dst, compression='zstd')
+        print(f"{src} -> {dst} ({len(totals)} brands)")
+
+def write_channel_partitions() -> None:
+    """Partition the per-channel snapshot by week_start month so the app can
+    read only the partitions overlapping the selected window as the file grows."""
+    for base in DATA_CANDIDATES:
+        src = base / "youtube_brand_channel_weekly_snapshot_ALL.csv"
+        if not src.exists():
+            continue
+        df = pd.read_csv(src, encoding='utf-8')
+        df['week_start'] = pd.to_datetime(df['week_start'])
+        if 'week_end' in df.columns:
+            df['week_end'] = pd.to_datetime(df['week_end'])
+        else:
+            df['week_end'] = df['week_start'] + pd.Timedelta(days=6)
+        df['month'] = df['week_start'].dt.strftime('%Y-%m')
+        dst = base / "channel_weekly"
+        # to_parquet appends new part files into existing partitions, so a
+        # re-run would double every row; rebuild the dataset from scratch.
+        if dst.exists():
+            shutil.rmtree(dst)
+        df.to_parquet(dst, compression='zstd', partition_cols=['month'])
+        print(f"{src} -> {dst}/ ({df['month'].nunique()} month partitions)")
+
+if __name__ == "__main__":
+    for fname, date_cols in FILES:
+        migrate(fname, date_cols)
+    write_brand_totals()
+    write_channel_partitions()
@@ -5,18 +5,60 @@ Works with the combined weekly snapshot files:
   - youtube_brand_channel_weekly_snapshot_ALL.csv (weekly per-channel breakdown)
 """
 
+from dataclasses import dataclass
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 import streamlit as st
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; pandas fallback below
+    njit = None
+
+try:
+    import polars as pl
+except ImportError:  # polars is optional; pandas fallback below
+    pl = None
+
+try:
+    from tsdownsample import MinMaxLTTBDownsampler
+except ImportError:  # tsdownsample is optional; plots stay undecimated
+    MinMaxLTTBDownsampler = None
+
+DOWNSAMPLE_THRESHOLD = 2000
+DOWNSAMPLE_N_OUT = 1000
+
+def decimate(x: np.ndarray, y: np.ndarray):
+    """MinMaxLTTB decimation to ~1000 points per trace once a window grows past
+    a few thousand points; a no-op for the weekly windows served today."""
+    if MinMaxLTTBDownsampler is None or len(x) <= DOWNSAMPLE_THRESHOLD:
+        return x, y
+    idx = MinMaxLTTBDownsampler().downsample(x, y, n_out=DOWNSAMPLE_N_OUT)
+    return x[idx], y[idx]
+
 DATA_CANDIDATES = [
     Path("../snapshot_data"),
     Path("../data"),
     Path("data"),
 ]
-BRAND_WEEKLY_FILE = "brand_weekly_for_streamlit.csv"
-CHANNEL_WEEKLY_FILE = "youtube_brand_channel_weekly_snapshot_ALL.csv"
+@dataclass(frozen=True)
+class Source:
+    """One dashboard variant: its display name and the snapshot files it reads."""
+    name: str
+    brand_weekly: str
+    channel_weekly: str
+    brand_totals: str = "brand_totals_all.parquet"
+
+SOURCES = {
+    "YouTube": Source(
+        name="YouTube",
+        brand_weekly="brand_weekly_for_streamlit.csv",
+        channel_weekly="youtube_brand_channel_weekly_snapshot_ALL.csv",
+    ),
+}
 
 def find_file(fname: str) -> Path:
     for base in DATA_CANDIDATES:
@@ -25,13 +67,149 @@ def find_file(fname: str) -> Path:
             return p
     raise FileNotFoundError(f"Could not find {fname} in any of: {[str(b) for b in DATA_CANDIDATES]}")
 
-brand_path = find_file(BRAND_WEEKLY_FILE)
-df = pd.read_csv(brand_path, encoding='utf-8')
+def _read_csv(path: str, **kwargs) -> pd.DataFrame:
+    """Parse with pyarrow's multithreaded CSV engine when available; fall back
+    to the single-threaded C engine on older pandas/pyarrow or unsupported args."""
+    try:
+        return pd.read_csv(path, engine='pyarrow', **kwargs)
+    except (ImportError, TypeError, ValueError):
+        return pd.read_csv(path, **kwargs)
+
+def channel_dataset(path: Path):
+    """The partitioned dataset dir for the channel snapshot, or None when it is
+    absent or older than the file it was built from (stale migration)."""
+    ds = path.parent / CHANNEL_DATASET_DIR
+    if ds.exists() and ds.stat().st_mtime >= path.stat().st_mtime:
+        return ds
+    return None
+
+def parquet_sibling(path: Path) -> Path:
+    """Prefer the Parquet copy written by build_parquet_cache.py, unless the
+    CSV has been refreshed since the migration last ran (stale sibling)."""
+    pq = path.with_suffix('.parquet')
+    if pq.exists() and (not path.exists() or pq.stat().st_mtime >= path.stat().st_mtime):
+        return pq
+    return path
+
+METRIC_DTYPES = {
+    'weekly_video_mentions': 'float32',
+    'weekly_api_hits': 'float32',
+    'weekly_views': 'float32',
+    'weekly_likes': 'float32',
+    'weekly_comments': 'float32',
+}
+CHANNEL_DTYPES = {
+    'subscribers': 'Int64',
+    'views': 'Int64',
+    'likeCount': 'Int64',
+    'commentCount': 'Int64',
+}
+
+CHANNEL_NEED_COLS = [
+    'week_start', 'week_end', 'keyword', 'channel',
+    'subscribers', 'views', 'likeCount', 'commentCount',
+]
+CHANNEL_DATASET_DIR = "channel_weekly"
+
+if njit is not None:
+    @njit(cache=True)
+    def _topk_per_group(codes, values, k, ngroups):
+        """One pass over (group code, value) pairs keeping a sorted size-k
+        buffer per group; returns row indices, -1 where a group has <k rows."""
+        best_vals = np.full((ngroups, k), -np.inf)
+        best_idx = np.full((ngroups, k), -1, dtype=np.int64)
+        for i in range(codes.shape[0]):
+            g = codes[i]
+            v = values[i]
+            for j in range(k):
+                if v > best_vals[g, j]:
+                    for m in range(k - 1, j, -1):
+                        best_vals[g, m] = best_vals[g, m - 1]
+                        best_idx[g, m] = best_idx[g, m - 1]
+                    best_vals[g, j] = v
+                    best_idx[g, j] = i
+                    break
+        return best_idx
+
+def top_rows_per_group(agg: pd.DataFrame, value_col: str, k: int = 3) -> pd.DataFrame:
+    """Top-k rows per keyword, ordered keyword-ascending / value-descending."""
+    if njit is not None:
+        codes = agg['keyword'].cat.codes.to_numpy(dtype=np.int64)
+        vals = agg[value_col].to_numpy(dtype='float64')
+        idx = _topk_per_group(codes, vals, k, len(agg['keyword'].cat.categories)).ravel()
+        return agg.iloc[idx[idx >= 0]].reset_index(drop=True)
+    gi = agg.groupby('keyword', observed=True)[value_col].nlargest(k).index.get_level_values(1)
+    return agg.loc[gi].reset_index(drop=True)
+
+def _categorize(df: pd.DataFrame) -> pd.DataFrame:
+    """Store the repetitive label columns as categoricals: integer-code
+    comparisons instead of str hashing in isin/groupby, and far less memory."""
+    for c in ('keyword', 'channel'):
+        if c in df.columns:
+            df[c] = df[c].astype('category')
+    return df
+
+@st.cache_data(show_spinner=False)
+def load_brand_weekly(path: str, mtime: float):
+    """Load the weekly brand snapshot once per session (mtime busts the cache
+    on file edits); returns the frame plus the sorted brand list so reruns
+    don't rebuild it."""
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path)
+    else:
+        header = pd.read_csv(path, nrows=0, encoding='utf-8').columns
+        dtype = {c: t for c, t in METRIC_DTYPES.items() if c in header}
+        df = _read_csv(path, encoding='utf-8', dtype=dtype)
+        if 'week_start' in df.columns:
+            df['week_start'] = pd.to_datetime(df['week_start'])
+        if 'week_end' in df.columns:
+            df['week_end'] = pd.to_datetime(df['week_end'])
+    df = _categorize(df)
+    brands = sorted(df['keyword'].cat.categories) if 'keyword' in df.columns else []
+    return df, brands
+
+@st.cache_data(show_spinner=False)
+def load_channel_weekly(path: str, mtime: float) -> pd.DataFrame:
+    """Load the per-channel weekly snapshot once per session (mtime busts the cache on file edits)."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        schema_names = pq.read_schema(path).names
+        cols = [c for c in CHANNEL_NEED_COLS if c in schema_names]
+        chw = pd.read_parquet(path, columns=cols)
+        if 'week_end' not in chw.columns:
+            chw['week_end'] = chw['week_start'] + pd.Timedelta(days=6)
+        return _categorize(chw)
+    header = pd.read_csv(path, nrows=0, encoding='utf-8').columns
+    dtype = {c: t for c, t in CHANNEL_DTYPES.items() if c in header}
+    usecols = [c for c in CHANNEL_NEED_COLS if c in header]
+    try:
+        chw = _read_csv(path, encoding='utf-8', dtype=dtype, usecols=usecols)
+    except (TypeError, ValueError):
+        # Bad rows in the count columns: re-read untyped, coerce in one pass.
+        chw = _read_csv(path, encoding='utf-8', usecols=usecols)
+        cols = [c for c in CHANNEL_DTYPES if c in chw.columns]
+        chw[cols] = chw[cols].apply(pd.to_numeric, errors='coerce').astype('Int64')
+    chw['week_start'] = pd.to_datetime(chw['week_start'])
+    if 'week_end' in chw.columns:
+        chw['week_end'] = pd.to_datetime(chw['week_end'])
+    else:
+        chw['week_end'] = chw['week_start'] + pd.Timedelta(days=6)
+    return _categorize(chw)
+
+@st.cache_data(show_spinner=False)
+def load_brand_totals(path: str, mtime: float) -> pd.DataFrame:
+    """Tiny keyword-by-metric totals sidecar written by build_parquet_cache.py."""
+    return pd.read_parquet(path)
+
+if len(SOURCES) > 1:
+    src = SOURCES[st.sidebar.selectbox("Data source", list(SOURCES))]
+else:
+    src = next(iter(SOURCES.values()))
+
+brand_path = parquet_sibling(find_file(src.brand_weekly))
+df, brand_cols = load_brand_weekly(str(brand_path), brand_path.stat().st_mtime)
 if 'week_start' not in df.columns or 'keyword' not in df.columns:
     st.stop()
-df['week_start'] = pd.to_datetime(df['week_start'])
-if 'week_end' in df.columns:
-    df['week_end'] = pd.to_datetime(df['week_end'])
 available_metrics = [c for c in [
     'weekly_video_mentions', 'weekly_api_hits', 'weekly_views', 'weekly_likes', 'weekly_comments'
 ] if c in df.columns]
@@ -39,8 +217,8 @@ if not available_metrics:
     st.stop()
 
 min_d, max_d = df['week_start'].min().date(), df['week_start'].max().date()
-st.set_page_config(page_title="YouTube Brands – Weekly Snapshot", layout='wide')
-st.title("YouTube Brands – Weekly Snapshot (Weekly granularity)")
+st.set_page_config(page_title=f"{src.name} Brands – Weekly Snapshot", layout='wide')
+st.title(f"{src.name} Brands – Weekly Snapshot (Weekly granularity)")
 metric = st.selectbox("Metric", available_metrics, index=0)
 wk_range = st.date_input("Week range (by week_start)", value=(min_d, max_d))
 if isinstance(wk_range, tuple):
@@ -50,69 +228,146 @@ else:
 mask = (df['week_start'].dt.date >= start_date) & (df['week_start'].dt.date <= end_date)
 week = df.loc[mask].copy()
 
-brand_cols = sorted(week['keyword'].unique())
-totals = (week.groupby('keyword')[metric].sum().sort_values(ascending=False))
-default_brands = list(totals.head(5).index)
+full_range = start_date <= min_d and end_date >= max_d
+totals = None
+if full_range:
+    try:
+        totals_path = find_file(src.brand_totals)
+        # Ignore a sidecar older than the snapshot it was built from.
+        if totals_path.stat().st_mtime >= brand_path.stat().st_mtime:
+            totals_all = load_brand_totals(str(totals_path), totals_path.stat().st_mtime)
+            if metric in totals_all.columns:
+                totals = totals_all[metric].sort_values(ascending=False)
+    except FileNotFoundError:
+        pass
+if totals is None:
+    totals = (week.groupby('keyword', observed=True)[metric].sum().sort_values(ascending=False))
+default_brands = [b for b in totals.head(5).index if b in brand_cols]
 selected = st.multiselect("Pick brands to plot", options=brand_cols, default=default_brands)
 if selected:
-    long_df = week[week['keyword'].isin(selected)][['week_start','keyword',metric]].rename(columns={'keyword':'brand','week_start':'x','%s'%metric:'y'})
-    fig = px.line(long_df, x='x', y='y', color='brand', markers=True,
-                  title=f'Weekly {metric} for selected brands')
-    fig.update_layout(xaxis_title='Week start (UTC)', yaxis_title=metric.replace('_',' ').title(), hovermode='x unified')
+    sel = week[week['keyword'].isin(selected)]
+    fig = go.Figure()
+    for b in selected:
+        rows = sel[sel['keyword'] == b]
+        x, y = decimate(rows['week_start'].to_numpy(), rows[metric].to_numpy())
+        fig.add_trace(go.Scattergl(x=x, y=y, mode='lines+markers', name=b))
+    fig.update_layout(title=f'Weekly {metric} for selected brands',
+                      xaxis_title='Week start (UTC)', yaxis_title=metric.replace('_',' ').title(), hovermode='x unified')
     st.plotly_chart(fig, use_container_width=True)
     with st.expander("Show data table"):
-        st.dataframe(long_df.sort_values(["brand","x"]).reset_index(drop=True))
+        # Expander bodies run on every rerun even while collapsed; gate the
+        # long-frame build on a checkbox so it only happens when wanted.
+        if st.checkbox("Load table", key="show_plot_table"):
+            long_df = sel[['week_start','keyword',metric]].rename(columns={'keyword':'brand','week_start':'x','%s'%metric:'y'})
+            # brand is categorical and x is datetime64: lexsort on the raw
+            # codes/int64 views instead of pandas' generic sort_values.
+            order = np.lexsort((long_df['x'].to_numpy().view('i8'), long_df['brand'].cat.codes.to_numpy()))
+            st.dataframe(long_df.iloc[order].reset_index(drop=True))
 else:
     st.info("Select at least one brand to display the plot.")
 
 if {'weekly_api_hits','weekly_video_mentions'}.issubset(set(week.columns)) and selected:
     diff = (week[week['keyword'].isin(selected)]
-              .pivot_table(index='week_start', columns='keyword', values='weekly_api_hits', aggfunc='sum') -
+              .pivot_table(index='week_start', columns='keyword', values='weekly_api_hits', aggfunc='sum', observed=True) -
             week[week['keyword'].isin(selected)]
-              .pivot_table(index='week_start', columns='keyword', values='weekly_video_mentions', aggfunc='sum'))
+              .pivot_table(index='week_start', columns='keyword', values='weekly_video_mentions', aggfunc='sum', observed=True))
     st.subheader("API Hits minus Text-Confirmed (diagnostic)")
     st.line_chart(diff.fillna(0))
 
-try:
-    ch_path = find_file(CHANNEL_WEEKLY_FILE)
-    chw = pd.read_csv(ch_path, encoding='utf-8')
-except Exception as e:
-    chw = None
-
-if selected and chw is not None:
-    need_cols = {"week_start", "keyword", "channel", "subscribers", "views", "likeCount", "commentCount"}
-    if need_cols.issubset(set(chw.columns)):
-        start_dt = pd.to_datetime(start_date)
-        end_dt = pd.to_datetime(end_date)
+chw = None
+have_channels = False
+if selected:
+    # The per-channel snapshot is the largest input; don't touch it until a
+    # brand selection actually needs the reach/engagement tables. When the
+    # partitioned dataset exists, skip the full-frame load entirely — the
+    # cached aggregation reads just the overlapping partitions.
+    try:
+        ch_path = parquet_sibling(find_file(src.channel_weekly))
+        ch_mtime = ch_path.stat().st_mtime
+        if channel_dataset(ch_path) is None:
+            chw = load_channel_weekly(str(ch_path), ch_mtime)
+        have_channels = True
+    except Exception:
+        chw = None
 
-        chw["week_start"] = pd.to_datetime(chw["week_start"])
-        if "week_end" in chw.columns:
-            chw["week_end"] = pd.to_datetime(chw["week_end"])
-        else:
-            chw["week_end"] = chw["week_start"] + pd.Timedelta(days=6)
+@st.cache_data(show_spinner=False)
+def compute_top_channels(path: str, mtime: float, selected_tuple: tuple, start_dt: pd.Timestamp, end_dt: pd.Timestamp):
+    """Filter, aggregate and rank the channel snapshot for one (selection,
+    window); cached so reruns from unrelated widget changes cost nothing."""
+    ds_dir = channel_dataset(Path(path))
+    if ds_dir is not None:
+        # Partitioned dataset from build_parquet_cache.py: push the window and
+        # brand predicates into the reader so only overlapping partitions are
+        # touched, keeping cost bound by the window rather than file history.
+        import pyarrow.dataset as pads
+        dataset = pads.dataset(str(ds_dir), partitioning='hive')
+        filt = ((pads.field('week_start') <= end_dt) & (pads.field('week_end') >= start_dt)
+                & pads.field('keyword').isin(list(selected_tuple)))
+        sub = dataset.to_table(filter=filt, columns=[
+            "keyword", "channel", "subscribers", "views", "likeCount", "commentCount"
+        ]).to_pandas()
+        sub = _categorize(sub)
+    else:
+        chw = load_channel_weekly(path, mtime)
 
-        overlaps = (chw["week_start"] <= end_dt) & (chw["week_end"] >= start_dt)
-        mask = overlaps & (chw["keyword"].isin(selected))
+        # One numpy expression over the underlying arrays instead of three
+        # chained boolean Series: int64 datetime views + categorical codes.
+        # Request ns explicitly: Timestamp.value is always ns, while the
+        # stored resolution varies by pandas version.
+        ws = chw["week_start"].to_numpy('datetime64[ns]').view('i8')
+        we = chw["week_end"].to_numpy('datetime64[ns]').view('i8')
+        codes = chw["keyword"].cat.codes.to_numpy()
+        sel_codes = chw["keyword"].cat.categories.get_indexer(selected_tuple)
+        mask = (ws <= end_dt.value) & (we >= start_dt.value) & np.isin(codes, sel_codes[sel_codes >= 0])
 
         sub = chw.loc[mask, [
             "keyword", "channel", "subscribers", "views", "likeCount", "commentCount"
         ]].copy()
 
-        for col in ["subscribers", "views", "likeCount", "commentCount"]:
-            sub[col] = pd.to_numeric(sub[col], errors="coerce").fillna(0).astype(int)
-
-        if not sub.empty:
-            agg = (sub.groupby(["keyword", "channel"], as_index=False)
-                     .agg({
-                         "subscribers": "max",
-                         "views": "sum",
-                         "likeCount": "sum",
-                         "commentCount": "sum",
-                     }))
-            agg["engagement"] = agg["views"].fillna(0) + agg["likeCount"].fillna(0) + agg["commentCount"].fillna(0)
-
-            top_reach = (agg.sort_values(["keyword", "subscribers"], ascending=[True, False])
-                            .groupby("keyword").head(3).reset_index(drop=True))
+    num_cols = ["subscribers", "views", "likeCount", "commentCount"]
+    sub[num_cols] = sub[num_cols].fillna(0)
+
+    if sub.empty:
+        return None, None
+
+    if pl is not None:
+        # Polars runs the hash groupby multithreaded; convert back to pandas
+        # (re-categorized) for the shared ranking helper.
+        agg = (pl.from_pandas(sub).lazy()
+                 .group_by(["keyword", "channel"])
+                 .agg([
+                     pl.col("subscribers").max(),
+                     pl.col("views").sum(),
+                     pl.col("likeCount").sum(),
+                     pl.col("commentCount").sum(),
+                 ])
+                 .with_columns((pl.col("views") + pl.col("likeCount") + pl.col("commentCount")).alias("engagement"))
+                 .collect().to_pandas())
+        agg = _categorize(agg)
+        # polars hands back categories in hash-groupby order; restore the
+        # alphabetical order top_rows_per_group's ranking relies on.
+        agg['keyword'] = agg['keyword'].cat.reorder_categories(sorted(agg['keyword'].cat.categories))
+    else:
+        agg = (sub.groupby(["keyword", "channel"], as_index=False, observed=True)
+                 .agg({
+                     "subscribers": "max",
+                     "views": "sum",
+                     "likeCount": "sum",
+                     "commentCount": "sum",
+                 }))
+        agg["engagement"] = agg["views"] + agg["likeCount"] + agg["commentCount"]
+    return top_rows_per_group(agg, "subscribers"), top_rows_per_group(agg, "engagement")
+
+if selected and have_channels:
+    need_cols = {"week_start", "keyword", "channel", "subscribers", "views", "likeCount", "commentCount"}
+    if chw is None or need_cols.issubset(set(chw.columns)):
+        start_dt = pd.to_datetime(start_date)
+        end_dt = pd.to_datetime(end_date)
+
+        top_reach, top_eng = compute_top_channels(
+            str(ch_path), ch_mtime, tuple(sorted(selected)), start_dt, end_dt)
+
+        if top_reach is not None:
             top_reach = top_reach.rename(columns={
                 "subscribers": "reach (subscribers)",
                 "views": "total views",
@@ -122,8 +377,6 @@ if selected and chw is not None:
             st.subheader("Top channels for selected brands (by reach: subscribers)")
             st.dataframe(top_reach, use_container_width=True)
 
-            top_eng = (agg.sort_values(["keyword", "engagement"], ascending=[True, False])
-                         .groupby("keyword").head(3).reset_index(drop=True))
             top_eng = top_eng.rename(columns={
                 "engagement": "total engagement (views+likes+comments)",
                 "views": "total views",
@@ -134,6 +387,8 @@ if selected and chw is not None:
             st.dataframe(top_eng[["keyword", "channel", "total engagement (views+likes+comments)", "total views", "total likes", "total comments"]], use_container_width=True)
         else:
             try:
+                if chw is None:  # only needed for the diagnostics below
+                    chw = load_channel_weekly(str(ch_path), ch_mtime)
                 min_w = chw["week_start"].min()
                 max_w = chw["week_end"].max() if "week_end" in chw.columns else (chw["week_start"].max() + pd.Timedelta(days=6))
                 brands_in_file = ", ".join(sorted(map(str, set(chw["keyword"].unique()))))
@@ -148,7 +403,7 @@ elif selected:
 st.markdown("---")
 show_top10 = st.checkbox("Show Top 10 brands (by total over selected weeks)", value=False)
 if show_top10 and not week.empty:
-    totals_sel = (week.groupby('keyword')[metric].sum().sort_values(ascending=False).head(10))
+    totals_sel = totals.head(10)
     top10 = list(totals_sel.index)
     top_long = week[week['keyword'].isin(top10)][['week_start','keyword',metric]].rename(columns={'keyword':'brand'})
     fig2 = px.line(top_long, x='week_start', y=metric, color='brand', markers=True,